@@ -1,13 +1,46 @@
 import hashlib
 
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-from core.pdf_analyzer import analyze_pdf_and_template
+from core.pdf_analyzer import analyze_pdf_and_template, load_template
 
 
 TEMPLATE_PATH = "templates/지급조서_템플릿.xlsx"
 
+# 업로드 PDF 최대 크기 (월별집계 PDF 는 보통 수 MB 이내)
+MAX_PDF_MB = 50
+
+
+@st.cache_resource
+def _load_template_bytes() -> bytes:
+    """템플릿 엑셀은 배포 중 바뀌지 않으므로 워커당 한 번만 읽는다."""
+    with open(TEMPLATE_PATH, "rb") as f:
+        return f.read()
+
+
+@st.cache_resource
+def _load_template():
+    """템플릿 파싱(값/스타일/레이아웃) 결과도 워커당 한 번만 만든다."""
+    return load_template(_load_template_bytes())
+
+
+@st.cache_resource
+def _template_signature() -> str:
+    """템플릿 내용 해시 (템플릿이 바뀌면 정산 결과 캐시도 무효화)."""
+    return hashlib.blake2b(_load_template_bytes(), digest_size=8).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_analyze(pdf_sig: str, template_sig: str, _pdf_file):
+    """
+    같은 PDF(내용 기준)로 다시 실행하면 파싱/엑셀 작성을 건너뛴다.
+    pdf_sig / template_sig 는 캐시 키로만 쓰이고,
+    _pdf_file(업로드 파일 객체)은 해시하지 않고 그대로 파서에 넘긴다.
+    """
+    return analyze_pdf_and_template(_pdf_file, _load_template())
+
 
 def render_page() -> None:
     st.set_page_config(
@@ -40,13 +73,17 @@ PDF 금액과 차이가 있는 경우 **지급조서에서 차이를 표시**합
         st.error("먼저 '출장 월별집계 PDF' 파일을 업로드해 주세요.")
         return
 
+    if uploaded_pdf.size > MAX_PDF_MB * 1024 * 1024:
+        st.error(f"PDF 파일이 너무 큽니다. {MAX_PDF_MB}MB 이하 파일만 업로드해 주세요.")
+        return
+
     with st.spinner("PDF 분석 및 지급조서 작성 중..."):
         try:
-            pdf_bytes = uploaded_pdf.read()
+            # 업로드 내용을 bytes 로 복사하지 않고, 내부 버퍼로 해시만 계산
+            pdf_sig = hashlib.blake2b(uploaded_pdf.getbuffer(), digest_size=16).hexdigest()
 
             # 템플릿 엑셀은 깃허브 repo 안에 있는 파일을 그대로 사용
-            with open(TEMPLATE_PATH, "rb") as f:
-                template_bytes = f.read()
+            template_sig = _template_signature()
 
         except FileNotFoundError:
             st.error(f"템플릿 파일을 찾을 수 없습니다: {TEMPLATE_PATH}")
@@ -57,10 +94,8 @@ PDF 금액과 차이가 있는 경우 **지급조서에서 차이를 표시**합
 
         try:
             # 핵심 로직: PDF + 템플릿 → (summary_df, 결과엑셀 bytes)
-            summary_df, result_bytes = analyze_pdf_and_template(
-                pdf_bytes,
-                template_bytes,
-            )
+            # (같은 PDF/템플릿이면 캐시된 결과 재사용)
+            summary_df, result_bytes = _cached_analyze(pdf_sig, template_sig, uploaded_pdf)
         except Exception as e:  # pragma: no cover - UI safeguard
             st.error(f"처리 중 오류가 발생했습니다: {e}")
             return
@@ -72,12 +107,14 @@ PDF 금액과 차이가 있는 경우 **지급조서에서 차이를 표시**합
     # 👉 여기서 '차이' 컬럼이 있을 때만 정렬/차이표 보여주기
     if isinstance(summary_df, pd.DataFrame):
         if "차이" in summary_df.columns:
-            # 차이 기준으로 정렬
-            summary_display = summary_df.sort_values("차이", ascending=False)
+            # 차이 기준으로 정렬 (정수 배열의 순서만 구해 .iloc 로 재배열)
+            diff_arr = summary_df["차이"].to_numpy()
+            order = np.argsort(-diff_arr, kind="stable")  # 내림차순, 같은 값은 성명 순 유지
+            summary_display = summary_df.iloc[order]
             st.dataframe(summary_display, use_container_width=True)
 
-            # 차이 나는 사람만 따로
-            diff_df = summary_display[summary_display["차이"] != 0]
+            # 차이 나는 사람만 따로 (이미 재배열한 배열 재사용)
+            diff_df = summary_display.iloc[np.flatnonzero(diff_arr[order] != 0)]
             if not diff_df.empty:
                 st.subheader("PDF 금액과 계산 금액이 다른 대상자 목록")
                 st.dataframe(diff_df, use_container_width=True)
@@ -8,22 +8,28 @@ PDF 파서 + 계산 규칙을 이용해
 - C5부터 데이터 입력 (연번/직급/성명 등은 비어있어도 상관없음)
 - 기본 21명(= C5~C25)까지 들어가는 양식이고,
   이 경우 합계는 원래 H26 셀에 있어야 한다.
-- 21명을 초과하면 H26 위에 줄을 추가로 삽입해서,
+- 21명을 초과하면 H26 위에 그만큼 데이터 행을 더 두어,
   마지막 사람 바로 아래 H열에 합계를 둔다.
-- 인원수 제한은 없으며, 22명 이상일 때 필요한 만큼 줄을 삽입해
-  대규모 명단도 합계 행이 자동으로 아래로 이동한다.
+- 인원수 제한은 없으며, 22명 이상일 때 필요한 만큼 행을 늘려
+  대규모 명단도 합계 행/하단 서명란이 자동으로 아래로 이동한다.
+- 결과 엑셀은 템플릿 xlsx의 시트 XML을 행 단위 문자열로 다시 써서 만든다.
+  (나머지 파트는 그대로 복사, PDF와 금액이 다른 셀용 빨간 굵은 서식만 추가)
 """
 
 from __future__ import annotations
-from typing import Tuple
+from types import SimpleNamespace
+from typing import Any, BinaryIO, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+import functools
 import io
+import re
+import zipfile
 
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font
 
 from .pdf_parser import parse_pdf_to_rows
-from .rules import compute_allowance_by_person
+from .rules import compute_row_allowance
 
 
 # 템플릿 고정 위치
@@ -37,15 +43,26 @@ COL_CAR = 6        # F열 차량사용횟수
 COL_PDF_AMT = 8    # H열 PDF 기준 지급액(원)
 COL_CALC_AMT = 12  # L열: 규칙상 올바른 금액 (PDF 금액과 다를 때만 표시)
 
+TEMPLATE_DATA_ROWS = 21                          # 템플릿 기본 데이터 행 수 (C5~C25)
+BASE_SUM_ROW = DATA_START_ROW + TEMPLATE_DATA_ROWS  # 5 + 21 = 26 (기본 합계 행)
+
 
 # ─────────────────────────────────────
 # 1. PDF 행 단위 → 사람별 집계
 # ─────────────────────────────────────
 
-def summarize_pdf_by_person(df_rows: pd.DataFrame) -> pd.DataFrame:
+def summarize_pdf_by_person(
+    df_rows: pd.DataFrame,
+    row_calc: Optional[np.ndarray] = None,
+    person_codes: Optional[Tuple[np.ndarray, Any]] = None,
+) -> SimpleNamespace:
     """
     행단위 df_rows (parse_pdf_to_rows 결과)를 받아
-    PDF 기준 성명별 집계 DataFrame 생성.
+    PDF 기준 성명별 집계를 NumPy 배열 묶음(SoA)으로 생성.
+    row_calc(compute_row_allowance 결과, 행별 규칙 금액)를 주면
+    같은 성명 집계에서 계산 금액 합계도 함께 만든다.
+    person_codes(compute_row_allowance(..., return_person_codes=True) 의 두 번째 값)를 주면
+    성명을 다시 인코딩하지 않고 그 코드를 그대로 쓴다.
 
     기대 열:
       - '성명'
@@ -53,51 +70,345 @@ def summarize_pdf_by_person(df_rows: pd.DataFrame) -> pd.DataFrame:
       - 'car_used'  : 공용차량 사용 여부 (True/False 또는 0/1)
       - 'amount_pdf': PDF에 찍힌 해당 출장의 금액(원)
 
-    반환:
-        index: 성명
-        columns:
-          - 총지급액_숫자
-          - 4시간미만
-          - 4시간이상
-          - 차량사용횟수
-    """
-    df = df_rows.copy()
-
-    # 안전장치 (열 없으면 0으로)
-    for col in ["minutes", "car_used", "amount_pdf"]:
-        if col not in df.columns:
-            df[col] = 0
-
-    df["minutes"] = pd.to_numeric(df["minutes"], errors="coerce").fillna(0).astype(int)
-    df["car_used"] = df["car_used"].astype(bool)
-    df["amount_pdf"] = pd.to_numeric(df["amount_pdf"], errors="coerce").fillna(0).astype(int)
-
-    df["is_under4"] = (df["minutes"] > 0) & (df["minutes"] < 240)
-    df["is_over4"] = df["minutes"] >= 240
-    df["car_cnt"] = df["car_used"].astype(int)
-
-    grouped = df.groupby("성명", dropna=True).agg(
-        총지급액_숫자=("amount_pdf", "sum"),
-        _4시간미만=("is_under4", "sum"),
-        _4시간이상=("is_over4", "sum"),
-        차량사용횟수=("car_cnt", "sum"),
+    반환 (SimpleNamespace, 모든 배열은 성명 순으로 같은 길이):
+      - names       : 성명 (object 배열)
+      - amount_pdf  : 총지급액_숫자 (int64)
+      - under4      : 4시간미만 횟수 (int32)
+      - over4       : 4시간이상 횟수 (int32)
+      - car_cnt     : 차량사용횟수 (int32)
+      - amount_calc : 계산_총지급액 (int64, row_calc 를 준 경우만)
+    """
+    n = len(df_rows)
+
+    def _col(name: str) -> np.ndarray:
+        # 안전장치 (열 없으면 0으로)
+        if name not in df_rows.columns:
+            return np.zeros(n, dtype=np.int32)
+        return df_rows[name].to_numpy()
+
+    m = _col("minutes")
+    car = _col("car_used").astype(np.bool_, copy=False)
+    amt = _col("amount_pdf")
+
+    # 성명을 정렬된 정수 그룹 id로 바꾼 뒤 np.add.at 한 번씩으로 집계
+    # (성명이 비어 있는(NaN) 행은 코드 -1 → 집계에서 제외, compute_allowance_by_person 과 동일)
+    if person_codes is None:
+        person_codes = pd.factorize(df_rows["성명"], sort=True)
+    inv, names = person_codes
+    names = np.asarray(names, dtype=object)
+    n_names = len(names)
+    keep = inv >= 0
+    if not keep.all():
+        inv, m, car, amt = inv[keep], m[keep], car[keep], amt[keep]
+        if row_calc is not None:
+            row_calc = row_calc[keep]
+
+    amount_pdf = np.zeros(n_names, dtype=np.int64)
+    under4 = np.zeros(n_names, dtype=np.int32)
+    over4 = np.zeros(n_names, dtype=np.int32)
+    car_cnt = np.zeros(n_names, dtype=np.int32)
+
+    np.add.at(amount_pdf, inv, amt)
+    np.add.at(under4, inv, (m > 0) & (m < 240))
+    np.add.at(over4, inv, m >= 240)
+    np.add.at(car_cnt, inv, car)
+
+    summary = SimpleNamespace(
+        names=names,
+        amount_pdf=amount_pdf,
+        under4=under4,
+        over4=over4,
+        car_cnt=car_cnt,
     )
-
-    grouped = grouped.rename(columns={"_4시간미만": "4시간미만", "_4시간이상": "4시간이상"})
-    for c in ["총지급액_숫자", "4시간미만", "4시간이상", "차량사용횟수"]:
-        grouped[c] = grouped[c].fillna(0).astype(int)
-
-    return grouped
+    if row_calc is not None:
+        summary.amount_calc = np.zeros(n_names, dtype=np.int64)
+        np.add.at(summary.amount_calc, inv, row_calc)
+    return summary
 
 
 # ─────────────────────────────────────
 # 2. 템플릿에 집계 결과 채워넣기
 # ─────────────────────────────────────
 
-def fill_template_with_summary(template_bytes: bytes, summary: pd.DataFrame) -> bytes:
+# fill_template_with_summary 에서 성명별로 꺼내 쓰는 summary 열 (순서 고정)
+_RECORD_COLS = ["4시간미만", "4시간이상", "차량사용횟수", "총지급액_숫자", "계산_총지급액", "차이"]
+
+# 템플릿 xlsx 안의 XML 조각 파싱용
+_ROW_RE = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_REF_ATTR_RE = re.compile(r'\s+r="([A-Z]*)(\d+)"')
+_S_ATTR_RE = re.compile(r'\ss="(\d+)"')
+_MERGE_RE = re.compile(r'<mergeCell\s+ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"\s*/>')
+_MERGES_RE = re.compile(r"<mergeCells\b.*?</mergeCells>", re.S)
+_DIMENSION_RE = re.compile(r'<dimension\s+ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"\s*/>')
+# 데이터 유효성 검사(은행 목록 등) 적용 범위: <xm:sqref> 또는 sqref="..." 안의 A1:B2 참조
+_SQREF_RE = re.compile(r'(<xm:sqref>|\ssqref=")([^<"]*)')
+_RANGE_RE = re.compile(r"([A-Z]+)(\d+):([A-Z]+)(\d+)")
+_FONT_RE = re.compile(r"<font\b[^>]*?(?:/>|>.*?</font>)", re.S)
+_XF_RE = re.compile(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", re.S)
+
+# 셀 XML 스켈레톤 (값 없음 / 숫자 / 문자열 / 수식)
+_CELL_EMPTY = '<c r="{ref}"{s}/>'
+_CELL_NUM = '<c r="{ref}"{s}><v>{v}</v></c>'
+_CELL_STR = '<c r="{ref}"{s} t="inlineStr"><is><t>{v}</t></is></c>'
+_CELL_FORMULA = '<c r="{ref}"{s}><f>{v}</f></c>'
+# XML 에 쓸 수 없는 제어 문자 (openpyxl 의 ILLEGAL_CHARACTERS_RE 와 동일, 문자열 값에서 제거)
+_ILLEGAL_XML_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _col_letter(col: int) -> str:
+    """열 번호(1부터) → 열 문자 ('A', 'B', ..., 'AA')."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _col_index(letters: str) -> int:
+    """열 문자 → 열 번호(1부터)."""
+    col = 0
+    for ch in letters:
+        col = col * 26 + ord(ch) - ord("A") + 1
+    return col
+
+
+COL_PDF_AMT_LETTER = _col_letter(COL_PDF_AMT)  # 합계 수식용 열 문자 ("H")
+# 합계 수식의 고정된 앞부분 ("SUM(H5:H") — 마지막 데이터 행 번호만 붙이면 된다
+_SUM_FORMULA_PREFIX = f"SUM({COL_PDF_AMT_LETTER}{DATA_START_ROW}:{COL_PDF_AMT_LETTER}"
+
+
+def _main_sheet_path(parts: dict) -> str:
+    """workbook.xml 에서 활성 시트를 찾아 그 시트 XML 파트 경로를 반환."""
+    workbook_xml = parts["xl/workbook.xml"].decode("utf-8")
+    rels_xml = parts["xl/_rels/workbook.xml.rels"].decode("utf-8")
+
+    m = re.search(r'activeTab="(\d+)"', workbook_xml)
+    active = int(m.group(1)) if m else 0
+    rel_id = re.findall(r'<sheet\b[^>]*?r:id="([^"]+)"', workbook_xml)[active]
+
+    for rel in re.findall(r"<Relationship\b[^>]*>", rels_xml):
+        if f'Id="{rel_id}"' in rel:
+            target = re.search(r'Target="([^"]+)"', rel).group(1)
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise ValueError("템플릿에서 지급조서 시트를 찾지 못했습니다.")
+
+
+def _parse_sheet_rows(sheet_xml: str) -> dict:
+    """
+    <sheetData> 안의 행들을
+      {행번호: (행 속성, [(열번호, 열문자, s속성값, 셀 XML 나머지), ...])}
+    로 읽어둔다. (행/셀 속성에서 r="..." 는 빼고 보관 → 출력할 때 새 행 번호로 다시 붙임)
+    셀 XML 나머지는 '<c r="..."' 뒤에 그대로 이어 붙이면 되는 문자열(' s="3"/>' 등)이라
+    템플릿 셀을 그대로 옮길 때는 행 번호만 끼워 넣으면 된다.
+    """
+    rows = {}
+    for row_m in _ROW_RE.finditer(sheet_xml):
+        row_attrs, row_body = row_m.group(1), row_m.group(2) or ""
+        r = int(re.search(r'\sr="(\d+)"', row_attrs).group(1))
+        row_attrs = re.sub(r'\sr="\d+"', "", row_attrs)
+
+        cells = []
+        for cell_m in _CELL_RE.finditer(row_body):
+            attrs, body = cell_m.group(1), cell_m.group(2)
+            letters = _REF_ATTR_RE.search(attrs).group(1)
+            attrs = _REF_ATTR_RE.sub("", attrs)
+            s_m = _S_ATTR_RE.search(attrs)
+            rest = f"{attrs}/>" if body is None else f"{attrs}>{body}</c>"
+            cells.append((_col_index(letters), letters, s_m.group(1) if s_m else None, rest))
+        rows[r] = (row_attrs, cells)
+    return rows
+
+
+def _add_red_bold_styles(styles_xml: str, base_styles: set) -> Tuple[str, dict]:
+    """
+    styles.xml 에 '원래 글꼴 + 굵게 + 빨간색' 글꼴과, 그 글꼴을 쓰는 셀 서식(xf)을 추가.
+    base_styles 의 각 셀 서식 번호 → 빨간 굵은 글씨 버전 셀 서식 번호 dict 를 함께 반환.
+    """
+    fonts_m = re.search(r"(<fonts\b[^>]*>)(.*?)(</fonts>)", styles_xml, re.S)
+    xfs_m = re.search(r"(<cellXfs\b[^>]*>)(.*?)(</cellXfs>)", styles_xml, re.S)
+    fonts = _FONT_RE.findall(fonts_m.group(2))
+    xfs = _XF_RE.findall(xfs_m.group(2))
+
+    red_font_ids = {}
+    red_styles = {}
+    for s in sorted(base_styles, key=int):
+        xf = xfs[int(s)]
+        font_id = int(re.search(r'fontId="(\d+)"', xf).group(1))
+        if font_id not in red_font_ids:
+            font = fonts[font_id]
+            if font.endswith("/>"):  # <font/> 처럼 빈 글꼴
+                font = '<font><b/><color rgb="FFFF0000"/></font>'
+            else:
+                font = re.sub(r"<b\s*/>|<color\b[^>]*/>", "", font)
+                font = re.sub(r"^<font\b[^>]*>", lambda m: m.group(0) + '<b/><color rgb="FFFF0000"/>', font)
+            red_font_ids[font_id] = len(fonts)
+            fonts.append(font)
+
+        red_xf = re.sub(r'fontId="\d+"', f'fontId="{red_font_ids[font_id]}"', xf, count=1)
+        if "applyFont=" not in red_xf:
+            red_xf = red_xf.replace("<xf ", '<xf applyFont="1" ', 1)
+        red_styles[s] = str(len(xfs))
+        xfs.append(red_xf)
+
+    def _with_count(open_tag: str, count: int) -> str:
+        return re.sub(r'count="\d+"', f'count="{count}"', open_tag, count=1)
+
+    styles_xml = (
+        styles_xml[: fonts_m.start()]
+        + _with_count(fonts_m.group(1), len(fonts)) + "".join(fonts) + fonts_m.group(3)
+        + styles_xml[fonts_m.end(): xfs_m.start()]
+        + _with_count(xfs_m.group(1), len(xfs)) + "".join(xfs) + xfs_m.group(3)
+        + styles_xml[xfs_m.end():]
+    )
+    return styles_xml, red_styles
+
+
+def load_template(template_bytes: bytes) -> SimpleNamespace:
+    """
+    지급조서 템플릿 xlsx(ZIP)를 한 번 풀어서, 결과 엑셀을 만들 때 필요한 조각을 준비해둔다.
+    결과는 (frames 캐시에 추가하는 것 외에는) 읽기만 하므로 여러 번의 정산에서 그대로 재사용(캐시)해도 된다.
+
+    반환 (SimpleNamespace):
+      - static_zip  : 지급조서 시트를 뺀 나머지 파트를 미리 압축해 둔 ZIP bytes
+                      (styles.xml 은 빨간 굵은 글씨 서식을 추가한 버전으로 교체해 둠)
+      - sheet_path  : 지급조서 시트 XML 경로 (예: xl/worksheets/sheet1.xml)
+      - sheet_head  : <sheetData> 앞부분 XML (열 너비, 틀 고정 등)
+      - sheet_tail  : </sheetData> 뒷부분 XML (병합 셀 목록은 빼고 {merge_cells} 자리표시)
+      - rows        : {행번호: (행 속성, 셀 목록)}  (_parse_sheet_rows 참고)
+      - merges      : [(시작열, 시작행, 끝열, 끝행), ...]
+      - red_styles  : {셀 서식 번호: 빨간 굵은 글씨 버전 서식 번호}
+      - frames      : {추가 데이터 행 수: (sheetData 앞 XML, 뒤 XML)}  (_sheet_frame 캐시)
     """
-    지급조서 템플릿(엑셀 바이너리)에 summary 정보를 채워넣고,
-    결과 엑셀을 bytes로 반환.
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as zf:
+        parts = {info.filename: zf.read(info) for info in zf.infolist()}
+
+    sheet_path = _main_sheet_path(parts)
+    sheet_xml = parts[sheet_path].decode("utf-8")
+
+    head, rest = sheet_xml.split("<sheetData>", 1) if "<sheetData>" in sheet_xml else sheet_xml.split("<sheetData/>", 1)
+    if "</sheetData>" in rest:
+        body, tail = rest.split("</sheetData>", 1)
+    else:
+        body, tail = "", rest
+
+    merges = [
+        (m.group(1), int(m.group(2)), m.group(3), int(m.group(4)))
+        for m in _MERGE_RE.finditer(tail)
+    ]
+    if _MERGES_RE.search(tail):
+        tail = _MERGES_RE.sub("{merge_cells}", tail, count=1)
+    else:
+        tail = "{merge_cells}" + tail
+
+    rows = _parse_sheet_rows(body)
+
+    # 데이터 행(H/L열)에 쓰이는 서식만 빨간 굵은 글씨 버전을 미리 만들어 둔다
+    base_styles = {
+        s
+        for r in range(DATA_START_ROW, BASE_SUM_ROW)
+        for col, _, s, _ in rows.get(r, ("", []))[1]
+        if col in (COL_PDF_AMT, COL_CALC_AMT) and s is not None
+    } | {"0"}
+    styles_xml, red_styles = _add_red_bold_styles(parts["xl/styles.xml"].decode("utf-8"), base_styles)
+    parts["xl/styles.xml"] = styles_xml.encode("utf-8")
+
+    # 시트 외의 파트(서식, 공유 문자열, 테마 등)는 정산마다 같으므로 여기서 한 번만 압축해 두고,
+    # 결과 엑셀은 이 ZIP 뒤에 시트 XML 만 덧붙여 만든다
+    static = io.BytesIO()
+    with zipfile.ZipFile(static, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for name, data in parts.items():
+            if name != sheet_path:
+                zf.writestr(name, data)
+
+    return SimpleNamespace(
+        static_zip=static.getvalue(),
+        sheet_path=sheet_path,
+        sheet_head=head,
+        sheet_tail=tail,
+        rows=rows,
+        merges=merges,
+        red_styles=red_styles,
+        frames={},
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_template(template_bytes: bytes) -> SimpleNamespace:
+    """
+    템플릿 bytes 를 직접 넘겨받은 경우에도 매번 ZIP/XML 을 다시 풀지 않도록
+    내용(bytes)별로 load_template 결과를 보관해 두고 재사용한다
+    (가장 최근에 쓴 4개, LRU).
+    """
+    return load_template(template_bytes)
+
+
+def _sheet_frame(template: SimpleNamespace, extra_rows: int) -> Tuple[str, str]:
+    """
+    데이터 행이 extra_rows 만큼 늘어난 레이아웃의 <sheetData> 앞/뒤 XML.
+    (dimension, 병합 셀, 유효성 검사 범위를 미리 밀어둔 것)
+    결과는 템플릿 객체에 extra_rows 별로 보관해 같은 인원수로 다시 부르면 그대로 쓴다.
+    """
+    cached = template.frames.get(extra_rows)
+    if cached is not None:
+        return cached
+
+    def map_row(template_row: int) -> int:
+        return template_row + extra_rows if template_row >= BASE_SUM_ROW else template_row
+
+    head = _DIMENSION_RE.sub(
+        lambda m: f'<dimension ref="{m.group(1)}{m.group(2)}:{m.group(3)}{map_row(int(m.group(4)))}"/>',
+        template.sheet_head,
+        count=1,
+    )
+    merge_refs = [
+        f'<mergeCell ref="{c1}{map_row(r1)}:{c2}{map_row(r2)}"/>'
+        for c1, r1, c2, r2 in template.merges
+    ]
+    merge_xml = f'<mergeCells count="{len(merge_refs)}">{"".join(merge_refs)}</mergeCells>' if merge_refs else ""
+    tail = template.sheet_tail
+    if extra_rows:
+        # 데이터 영역(…~25행)에 걸린 유효성 검사 범위는 늘어난 마지막 데이터 행까지 확장
+        def map_end(template_row: int) -> int:
+            return template_row + extra_rows if template_row >= BASE_SUM_ROW - 1 else template_row
+
+        def shift_ranges(m):
+            refs = _RANGE_RE.sub(
+                lambda r: f"{r.group(1)}{map_row(int(r.group(2)))}:{r.group(3)}{map_end(int(r.group(4)))}",
+                m.group(2),
+            )
+            return m.group(1) + refs
+
+        tail = _SQREF_RE.sub(shift_ranges, tail)
+    tail = tail.replace("{merge_cells}", merge_xml, 1)
+
+    template.frames[extra_rows] = (head, tail)
+    return head, tail
+
+
+def _render_cell(ref: str, s, value) -> str:
+    """셀 하나를 XML로. value 는 None / int / str / ('=', 수식) 중 하나."""
+    s_attr = f' s="{s}"' if s is not None else ""
+    if value is None:
+        return _CELL_EMPTY.format(ref=ref, s=s_attr)
+    if isinstance(value, tuple):
+        return _CELL_FORMULA.format(ref=ref, s=s_attr, v=escape(value[1]))
+    if isinstance(value, str):
+        return _CELL_STR.format(ref=ref, s=s_attr, v=escape(_ILLEGAL_XML_CHARS_RE.sub("", value)))
+    return _CELL_NUM.format(ref=ref, s=s_attr, v=int(value))
+
+
+def fill_template_with_summary(
+    template: Union[bytes, SimpleNamespace],
+    summary: pd.DataFrame,
+) -> bytes:
+    """
+    지급조서 템플릿(엑셀 바이너리 또는 load_template 결과)에
+    summary 정보를 채워넣고, 결과 엑셀을 bytes로 반환.
+
+    openpyxl 로 워크북을 다시 만들지 않고, 템플릿의 시트 XML 행들을 문자열로
+    이어붙여 새 sheet XML 을 만든 뒤 나머지 파트와 함께 ZIP 으로 다시 묶는다.
+    (합계/하단 서명란 위치는 인원수에 맞춰 미리 계산)
 
     summary:
       index = 성명
@@ -109,97 +420,132 @@ def fill_template_with_summary(template_bytes: bytes, summary: pd.DataFrame) ->
         - 계산_총지급액
         - 차이
     """
-    summary = summary.copy()
-    summary = summary.fillna(0)
+    if "차이" not in summary.columns:
+        summary = summary.assign(
+            차이=summary.get("계산_총지급액", 0) - summary.get("총지급액_숫자", 0)
+        )
+    # 빈 칸(NaN)은 0 으로: 정수 변환 시 엉뚱한 값이 셀에 들어가지 않도록 6개 열에 한 번만 적용
+    summary = summary.reindex(columns=_RECORD_COLS, fill_value=0).fillna(0)
+
+    # 성명 순 정렬은 한 번만 (analyze_pdf_and_template 결과는 이미 정렬되어 있음)
+    if not summary.index.is_monotonic_increasing:
+        summary = summary.sort_index()
+
+    # (4시간미만, 4시간이상, 차량, PDF금액, 계산금액, 차이)를 int64 2차원 배열 하나로 꺼내
+    # 행마다 Series 를 만들지 않고, 파이썬 int 리스트로 한 번에 바꿔 사용 (빈 이름 제외)
+    values = summary.to_numpy(dtype=np.int64, copy=False)
+    # 차이가 있는 사람(L열 표시 + 빨간 굵은 글씨)도 열 단위로 한 번에 판정
+    differs = (values[:, 5] != 0).tolist()
+    people = [
+        (name_str, record, has_diff)
+        for name_str, record, has_diff in zip(
+            (str(name).strip() for name in summary.index.to_numpy()),
+            values.tolist(),
+            differs,
+        )
+        if name_str
+    ]
+
+    if isinstance(template, (bytes, bytearray)):
+        # bytearray 는 해시할 수 없으므로 bytes 로 바꿔 캐시 키로 사용
+        template = _cached_template(bytes(template))
 
-    for col in ["총지급액_숫자", "4시간미만", "4시간이상", "차량사용횟수", "계산_총지급액", "차이"]:
-        if col in summary.columns:
-            summary[col] = pd.to_numeric(summary[col], errors="coerce").fillna(0).astype(int)
-
-    wb = load_workbook(io.BytesIO(template_bytes))
-    ws = wb.active
-
-    red_bold_font = Font(color="FF0000", bold=True)
-
-    # 성명 목록 (보기 좋게 정렬)
-    people = list(summary.sort_index().iterrows())
     n_people = len(people)
 
-    # 사람 없으면 템플릿만 그대로 반환
-    if n_people == 0:
-        out_empty = io.BytesIO()
-        wb.save(out_empty)
-        out_empty.seek(0)
-        return out_empty.getvalue()
-
-    # ────────── 합계 위치 설계 ──────────
+    # ────────── 레이아웃 설계 ──────────
     # 기본: 21명(=C5~C25), 합계는 H26 (BASE_SUM_ROW)
-    MAX_ROWS_WITHOUT_INSERT = 21
-    BASE_SUM_ROW = DATA_START_ROW + MAX_ROWS_WITHOUT_INSERT  # 5 + 21 = 26
-
-    # 인원이 21명 초과면, BASE_SUM_ROW(26행) 위에 줄 삽입
-    if n_people > MAX_ROWS_WITHOUT_INSERT:
-        extra_rows = n_people - MAX_ROWS_WITHOUT_INSERT
-        ws.insert_rows(BASE_SUM_ROW, amount=extra_rows)
-        total_row = BASE_SUM_ROW + extra_rows  # 합계 행은 밑으로 밀림
-    else:
-        total_row = BASE_SUM_ROW  # 21명 이하이면 H26 고정
-
-    # ────────── 데이터 채우기 ──────────
-    current_row = DATA_START_ROW
-    for idx, (name, row) in enumerate(people, start=1):
-        name_str = str(name).strip()
-        if not name_str:
-            continue
-
-        under4 = int(row.get("4시간미만", 0) or 0)
-        over4 = int(row.get("4시간이상", 0) or 0)
-        car_cnt = int(row.get("차량사용횟수", 0) or 0)
-        amount_pdf = int(row.get("총지급액_숫자", 0) or 0)
-        amount_calc = int(row.get("계산_총지급액", 0) or 0)
-
-        # 연번(A열)
-        ws.cell(row=current_row, column=COL_NO).value = idx
-
-        # 성명(C열)
-        ws.cell(row=current_row, column=COL_NAME).value = name_str
-
-        # 4시간 미만/이상/차량 (0이면 공란)
-        ws.cell(row=current_row, column=COL_UNDER4).value = "" if under4 == 0 else under4
-        ws.cell(row=current_row, column=COL_OVER4).value = "" if over4 == 0 else over4
-        ws.cell(row=current_row, column=COL_CAR).value = "" if car_cnt == 0 else car_cnt
-
-        # PDF 금액(H열)
-        cell_h = ws.cell(row=current_row, column=COL_PDF_AMT)
-        cell_h.value = "" if amount_pdf == 0 else amount_pdf
-
-        # 계산 금액(L열) - '차이' 기준으로 표시 (계산액이 0이어도 차이가 있으면 표기)
-        diff = int(row.get("차이", amount_calc - amount_pdf) or 0)
-        cell_l = ws.cell(row=current_row, column=COL_CALC_AMT)
-
-        if diff != 0:
-            # 계산액이 0이어도, 차이가 있으면 0을 그대로 보여줌
-            cell_l.value = amount_calc
-            cell_h.font = red_bold_font
-            cell_l.font = red_bold_font
-        else:
-            cell_l.value = ""
-
-        current_row += 1
-
-    last_data_row = current_row - 1  # 마지막 사람 행
-
-    # ────────── 합계 수식(H열) 설정 ──────────
-    # 템플릿에서 A26:G26은 합쳐진 셀("합계" 글자 있음)이라
-    # G열에는 글자를 쓰지 않고, H열에만 수식 넣는다.
-    if last_data_row >= DATA_START_ROW:
-        first_cell = ws.cell(row=DATA_START_ROW, column=COL_PDF_AMT).coordinate
-        last_cell = ws.cell(row=last_data_row, column=COL_PDF_AMT).coordinate
-        ws.cell(row=total_row, column=COL_PDF_AMT).value = f"=SUM({first_cell}:{last_cell})"
-
-    out = io.BytesIO()
-    wb.save(out)
-    out.seek(0)
+    # 21명 초과면 데이터 행을 늘리고, 합계/하단 서명란은 그만큼 아래로 밀린다.
+    n_slots = max(n_people, TEMPLATE_DATA_ROWS)
+    extra_rows = n_slots - TEMPLATE_DATA_ROWS
+    total_row = BASE_SUM_ROW + extra_rows
+
+    def src_row(out_row: int) -> int:
+        """출력 행 번호 → 값/스타일을 가져올 템플릿 행 번호."""
+        if out_row < DATA_START_ROW:
+            return out_row
+        if out_row >= total_row:
+            return out_row - extra_rows
+        slot = out_row - DATA_START_ROW
+        if slot == n_slots - 1:
+            return BASE_SUM_ROW - 1  # 마지막 데이터 행(굵은 아래 테두리)
+        return min(DATA_START_ROW + slot, BASE_SUM_ROW - 2)
+
+    def map_row(template_row: int) -> int:
+        """템플릿 행 번호 → 출력 행 번호 (데이터 블록 이후만 밀림)."""
+        return template_row + extra_rows if template_row >= BASE_SUM_ROW else template_row
+
+    red_styles = template.red_styles
+
+    def red_bold(s):
+        return red_styles.get(s if s is not None else "0", s)
+
+    # ────────── 위에서부터 한 줄씩 XML 만들기 ──────────
+    # (행을 리스트로 모아두지 않고 ZIP 에 쓰는 시점에 하나씩 만든다)
+    last_template_row = max(template.rows, default=0)
+
+    def iter_rows():
+        for out_row in range(1, map_row(last_template_row) + 1):
+            template_row = src_row(out_row)
+            if template_row not in template.rows:
+                continue
+            row_attrs, cells = template.rows[template_row]
+
+            slot = out_row - DATA_START_ROW
+            overrides = {}
+            if 0 <= slot < n_people:
+                name_str, (under4, over4, car_cnt, amount_pdf, amount_calc, _), has_diff = people[slot]
+
+                overrides[COL_NO] = slot + 1                # 연번(A열)
+                overrides[COL_NAME] = name_str              # 성명(C열)
+                # 4시간 미만/이상/차량 (0이면 공란)
+                overrides[COL_UNDER4] = under4 or None
+                overrides[COL_OVER4] = over4 or None
+                overrides[COL_CAR] = car_cnt or None
+                overrides[COL_PDF_AMT] = amount_pdf or None  # PDF 금액(H열)
+
+                # 계산 금액(L열) - '차이' 기준으로 표시 (계산액이 0이어도 차이가 있으면 표기)
+                overrides[COL_CALC_AMT] = amount_calc if has_diff else None
+
+            elif out_row == total_row and n_people > 0:
+                # ────────── 합계 수식(H열) 설정 ──────────
+                # 템플릿에서 A26:G26은 합쳐진 셀("합계" 글자 있음)이라
+                # G열에는 글자를 쓰지 않고, H열에만 수식 넣는다.
+                last_data_row = DATA_START_ROW + n_people - 1
+                overrides[COL_PDF_AMT] = ("=", f"{_SUM_FORMULA_PREFIX}{last_data_row})")
+
+            highlight = 0 <= slot < n_people and people[slot][2]
+
+            parts = []
+            for col, letters, s, rest in cells:
+                if col not in overrides:
+                    # 템플릿 셀 그대로 (공유 문자열/서식 번호 유지)
+                    parts.append(f'<c r="{letters}{out_row}"{rest}')
+                    continue
+                ref = f"{letters}{out_row}"
+                if highlight and col in (COL_PDF_AMT, COL_CALC_AMT):
+                    s = red_bold(s)
+                parts.append(_render_cell(ref, s, overrides.pop(col)))
+            # 템플릿에 없던 열은 뒤에 붙인다
+            for col in sorted(overrides):
+                s = red_bold(None) if highlight and col in (COL_PDF_AMT, COL_CALC_AMT) else None
+                parts.append(_render_cell(f"{_col_letter(col)}{out_row}", s, overrides[col]))
+
+            yield f'<row r="{out_row}"{row_attrs}>{"".join(parts)}</row>'
+
+    # ────────── 시트 XML 앞/뒤 (인원수별로 한 번만 만들어 재사용) ──────────
+    head, tail = _sheet_frame(template, extra_rows)
+
+    # ────────── ZIP 묶기 ──────────
+    # 미리 압축해 둔 나머지 파트 뒤에 시트 XML 만 추가한다.
+    # 시트 XML 은 전체 문자열/바이트로 합치지 않고 행 단위로 바로 압축 스트림에 쓴다
+    out = io.BytesIO(template.static_zip)
+    with zipfile.ZipFile(out, "a", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        with zf.open(template.sheet_path, "w") as sheet:
+            sheet.write((head + "<sheetData>").encode("utf-8"))
+            for row in iter_rows():
+                sheet.write(row.encode("utf-8"))
+            sheet.write(("</sheetData>" + tail).encode("utf-8"))
+    # getvalue()는 위치와 무관하게 전체 버퍼를 돌려주므로 seek(0) 불필요
     return out.getvalue()
 
 
@@ -208,32 +554,40 @@ def fill_template_with_summary(template_bytes: bytes, summary: pd.DataFrame) ->
 # ─────────────────────────────────────
 
 def analyze_pdf_and_template(
-    pdf_bytes: bytes,
-    template_bytes: bytes,
+    pdf_source: Union[bytes, BinaryIO],
+    template: Union[bytes, SimpleNamespace],
 ) -> Tuple[pd.DataFrame, bytes]:
     """
-    PDF + 템플릿을 받아서:
+    PDF(bytes 또는 업로드 파일 객체) + 템플릿(엑셀 바이너리 또는 load_template 결과)을 받아서:
       - 성명별 요약 DataFrame(summary)
       - 템플릿에 결과 채운 엑셀 bytes
     를 반환.
     """
     # 1) PDF 파싱 (행 단위 데이터)
-    df_rows = parse_pdf_to_rows(pdf_bytes)
-
-    # 2) PDF 기준 집계
-    pdf_summary = summarize_pdf_by_person(df_rows)
-
-    # 3) 규칙에 따른 실제 지급액 계산 (rules.py)
-    calc_totals = compute_allowance_by_person(df_rows)
-    # calc_totals: index=성명, value=계산된 총지급액
-
-    # 4) summary 결합
-    summary = pdf_summary.copy()
-    # calc_totals를 summary index에 맞춰 align
-    summary["계산_총지급액"] = calc_totals.reindex(summary.index).fillna(0).astype(int)
-    summary["차이"] = summary["계산_총지급액"] - summary["총지급액_숫자"]
+    df_rows = parse_pdf_to_rows(pdf_source)
+
+    # 2) 규칙에 따른 건별 인정 금액 (rules.py, 일/월 상한 적용 후)
+    #    (상한 적용에 쓴 성명 코드도 받아 아래 집계에서 다시 인코딩하지 않음)
+    row_calc, person_codes = compute_row_allowance(df_rows, return_person_codes=True)
+
+    # 3) PDF 기준 집계 + 계산 금액 합계를 한 번의 성명 집계로 (성명별 NumPy 배열)
+    pdf_summary = summarize_pdf_by_person(df_rows, row_calc, person_codes)
+    amount_calc = pdf_summary.amount_calc
+
+    # 화면 표시/엑셀 작성용 DataFrame은 마지막에 한 번만 만든다
+    summary = pd.DataFrame(
+        {
+            "총지급액_숫자": pdf_summary.amount_pdf,
+            "4시간미만": pdf_summary.under4,
+            "4시간이상": pdf_summary.over4,
+            "차량사용횟수": pdf_summary.car_cnt,
+            "계산_총지급액": amount_calc,
+            "차이": amount_calc - pdf_summary.amount_pdf,
+        },
+        index=pd.Index(pdf_summary.names, name="성명"),
+    )
 
-    # 5) 템플릿 채우기
-    result_bytes = fill_template_with_summary(template_bytes, summary)
+    # 4) 템플릿 채우기
+    result_bytes = fill_template_with_summary(template, summary)
 
     return summary, result_bytes
@@ -11,23 +11,53 @@
   - 시작시각
   - 종료일자
   - 종료시각
-  - minutes        (총출장시간 분 단위, int)
+  - minutes        (총출장시간 분 단위, int32)
   - car_used       (공무용차량 사용 여부: bool)
-  - amount_pdf     (해당 출장 건의 금액, int)
+  - amount_pdf     (해당 출장 건의 금액, int64)
 """
 
 from __future__ import annotations
 from pathlib import Path
 from typing import List, Optional, Tuple, Union, BinaryIO
 import re
-import io
 
-import pdfplumber
+import numpy as np
 import pandas as pd
+import pymupdf
 
 
 # ---------------- 헬퍼 함수 ----------------
 
+# 시간/금액 문자열에서 지울 공백류 (공백, 탭, 줄바꿈, NBSP, 전각 공백)
+_WS_STRIP_TBL = str.maketrans("", "", " \t\r\n\u00a0\u3000")
+
+# 총출장시간: '1일 2시간 30분' 에서 일/시간/분 숫자 (단위별로 처음 나온 값, 없으면 NaN)
+_DURATION_RE = re.compile(r"^(?=(?:.*?(\d+)일)?)(?=(?:.*?(\d+)시간)?)(?=(?:.*?(\d+)분)?)")
+
+# 출장기간: (시작일자 시작시각) ~ (종료일자 종료시각)
+_PERIOD_PATTERNS = [
+    re.compile(
+        r"(?P<start_date>\d{4}-\d{1,2}-\d{1,2})\s+"
+        r"(?P<start_time>\d{1,2}:\d{2})\s*~\s*"
+        r"(?P<end_date>\d{4}-\d{1,2}-\d{1,2})\s+"
+        r"(?P<end_time>\d{1,2}:\d{2})"
+    ),
+    # 종료일자가 따로 없고, 같은 날짜로만 표기된 경우
+    re.compile(
+        r"(?P<date>\d{4}-\d{1,2}-\d{1,2})\s+"
+        r"(?P<start_time>\d{1,2}:\d{2}).*?(?P<end_time>\d{1,2}:\d{2})"
+    ),
+]
+
+_SPACES_RE = re.compile(r"\s+")
+
+# 성명 칸: '정홍식\n(A141714\n7)' 에서 첫 줄의 괄호 앞부분
+_NAME_RE = re.compile(r"^([^\r\n(]*)")
+
+# 이 페이지 수마다 MuPDF 내부 캐시를 비운다
+_STORE_SHRINK_PAGES = 20
+
+
 def _find_col(df: pd.DataFrame, keywords: List[str]) -> Optional[str]:
     """
     열 이름들 중에서 지정한 키워드들이 모두 포함된 열을 찾아 열 이름을 반환.
@@ -40,125 +70,81 @@ def _find_col(df: pd.DataFrame, keywords: List[str]) -> Optional[str]:
     return None
 
 
-def _parse_minutes(text: str) -> int:
+def _parse_minutes(texts: pd.Series) -> np.ndarray:
     """
-    '1일 2시간 30분', '7시간21분', '59분', '4시간', '1일' 등을 총 '분'으로 변환.
+    '1일 2시간 30분', '7시간21분', '59분', '4시간', '1일' 등을 총 '분'으로 변환 (열 전체를 한 번에).
     """
-    if text is None:
-        return 0
-    s = str(text).strip().replace(" ", "")
-    if not s:
-        return 0
-
-    days = hours = mins = 0
-
-    m = re.search(r"(\d+)일", s)
-    if m:
-        days = int(m.group(1))
-
-    m = re.search(r"(\d+)시간", s)
-    if m:
-        hours = int(m.group(1))
-
-    m = re.search(r"(\d+)분", s)
-    if m:
-        mins = int(m.group(1))
-
+    # 전각 숫자 등은 금액과 같이 NFKC 로 일반 숫자로 바꾼 뒤 추출
+    parts = (
+        texts.str.normalize("NFKC")
+        .str.translate(_WS_STRIP_TBL)
+        .str.extract(_DURATION_RE)
+    )
+    days, hours, mins = (
+        pd.to_numeric(parts[i], errors="coerce").fillna(0).to_numpy(dtype=np.int32)
+        for i in range(3)
+    )
     return days * 24 * 60 + hours * 60 + mins
 
 
-def _parse_period(text: str) -> Tuple[str, str, str, str]:
+def _parse_period(texts: pd.Series) -> pd.DataFrame:
     """
     '2025-11-14 09:00 ~ 2025-11-14 18:00'
     '2025-11-14 09:00\n~ 2025-11-14 18:00'
-    과 같이 시작/종료 일시가 포함된 문자열에서
-    (시작일자, 시작시각, 종료일자, 종료시각)을 반환한다.
-    인식하지 못하면 ("", "", "", "")을 반환.
+    과 같이 시작/종료 일시가 포함된 문자열 열에서
+    (시작일자, 시작시각, 종료일자, 종료시각) 4개 열을 한 번에 뽑는다.
+    인식하지 못한 행은 모두 "".
     """
-    if text is None:
-        return "", "", "", ""
-
-    s = str(text).strip()
-    if not s:
-        return "", "", "", ""
-
     # 줄바꿈, 탭 등을 공백으로 통일하고 '~' 주변에 공백 부여
-    s = s.replace("\r", " ").replace("\n", " ")
-    s = s.replace("~", " ~ ")
-    s = re.sub(r"\s+", " ", s)
-
-    # (시작일자 시작시각) ~ (종료일자 종료시각)
-    patterns = [
-        r"(?P<start_date>\d{4}-\d{1,2}-\d{1,2})\s+"
-        r"(?P<start_time>\d{1,2}:\d{2})\s*~\s*"
-        r"(?P<end_date>\d{4}-\d{1,2}-\d{1,2})\s+"
-        r"(?P<end_time>\d{1,2}:\d{2})",
-        # 종료일자가 따로 없고, 같은 날짜로만 표기된 경우
-        r"(?P<date>\d{4}-\d{1,2}-\d{1,2})\s+"
-        r"(?P<start_time>\d{1,2}:\d{2}).*?(?P<end_time>\d{1,2}:\d{2})",
-    ]
-
-    for pattern in patterns:
-        m = re.search(pattern, s)
-        if not m:
-            continue
+    s = (
+        texts.str.replace("\r", " ", regex=False)
+        .str.replace("\n", " ", regex=False)
+        .str.replace("~", " ~ ", regex=False)
+        .str.replace(_SPACES_RE, " ", regex=True)
+    )
 
-        group_dict = m.groupdict()
-        if "start_date" in group_dict:
-            return (
-                group_dict.get("start_date", ""),
-                group_dict.get("start_time", ""),
-                group_dict.get("end_date", ""),
-                group_dict.get("end_time", ""),
-            )
+    full_pat, same_day_pat = _PERIOD_PATTERNS
+    ext = s.str.extract(full_pat)
 
-        # 동일한 날짜로만 표기된 경우
-        date_only = group_dict.get("date", "")
-        return (
-            date_only,
-            group_dict.get("start_time", ""),
-            date_only,
-            group_dict.get("end_time", ""),
-        )
+    # 종료일자 없이 같은 날짜로만 표기된 행만 두 번째 패턴으로 다시 본다
+    missing = ext["start_date"].isna()
+    if missing.any():
+        same_day = s[missing].str.extract(same_day_pat)
+        ext.loc[missing, "start_date"] = same_day["date"]
+        ext.loc[missing, "start_time"] = same_day["start_time"]
+        ext.loc[missing, "end_date"] = same_day["date"]
+        ext.loc[missing, "end_time"] = same_day["end_time"]
 
-    return "", "", "", ""
+    return ext.fillna("")
 
 
-def _extract_name(raw: str) -> str:
+def _extract_page_tables(page) -> List[Tuple[list, list]]:
     """
-    '정홍식\\n(A141714\\n7)' 같은 문자열에서 실제 이름(첫 줄 또는 괄호 앞)만 추출.
+    한 페이지에서 '순번'으로 시작하는 출장 표만 골라 (헤더, 데이터 행 목록) 목록으로 반환.
+    (DataFrame 은 PDF 전체 행을 모은 뒤 한 번만 만든다)
     """
-    if raw is None:
-        return ""
-    s = str(raw).strip()
-    s = s.replace("\r", "\n")
-    if "\n" in s:
-        s = s.split("\n")[0]
-    if "(" in s:
-        s = s.split("(", 1)[0]
-    return s.strip()
-
-
-def _to_int_safe(x: str) -> int:
-    """
-    금액 문자열(예: '10,000', '0', '', '0원')을 int로 변환.
-    숫자가 없으면 0.
-    """
-    if x is None:
-        return 0
-    s = str(x).replace(",", "").replace(" ", "")
-    if s in ["", "-", "0원"]:
-        return 0
-    if not re.search(r"\d", s):
-        return 0
-    try:
-        return int(float(s))
-    except Exception:
-        return 0
+    # 표 찾기(선/글자 배치 분석)는 비싸므로, '순번' 글자가 없는 페이지는 건너뛴다
+    if "순번" not in page.get_text():
+        return []
+
+    tables = []
+    for found in page.find_tables().tables:
+        table = found.extract()
+        if not table:
+            continue
+        header = table[0]
+        if not header:
+            continue
+        # '순번'으로 시작하는 표만 출장 데이터로 간주
+        if str(header[0]).strip() != "순번":
+            continue
+        tables.append((header, table[1:]))
+    return tables
 
 
 # ---------------- 메인 파서 ----------------
 
+
 def parse_pdf_to_rows(
     pdf_source: Union[bytes, BinaryIO, str, Path]
 ) -> pd.DataFrame:
@@ -176,41 +162,44 @@ def parse_pdf_to_rows(
       - car_used       (공무용차량 사용 여부: bool)
       - amount_pdf     (PDF의 합계 금액, int)
     """
-    # pdfplumber가 받을 수 있는 형태로 정리
-    if isinstance(pdf_source, (bytes, bytearray)):
-        pdf_file = io.BytesIO(pdf_source)
+    # PyMuPDF가 받을 수 있는 형태로 정리 (bytes / 파일 객체는 메모리 스트림으로)
+    if isinstance(pdf_source, (str, Path)):
+        doc = pymupdf.open(pdf_source)
     else:
-        pdf_file = pdf_source  # 파일 경로나 파일 객체
-
-    tables = []
-
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            extracted = page.extract_tables()
-            for table in extracted:
-                if not table:
-                    continue
-                header = table[0]
-                if not header:
-                    continue
-                # '순번'으로 시작하는 표만 출장 데이터로 간주
-                if str(header[0]).strip() != "순번":
-                    continue
-                rows = table[1:]
-                df_page = pd.DataFrame(rows, columns=header)
-                tables.append(df_page)
-
-    if not tables:
+        if hasattr(pdf_source, "getbuffer"):
+            # BytesIO (Streamlit UploadedFile 포함): 복사 없이 내부 버퍼를 그대로 넘긴다
+            pdf_source = pdf_source.getbuffer()
+        elif not isinstance(pdf_source, (bytes, bytearray)):
+            pdf_source = pdf_source.read()
+        doc = pymupdf.open(stream=pdf_source, filetype="pdf")
+
+    # 같은 헤더가 이어지는 표들의 행은 한 목록으로 모은다: [(헤더, 행 목록), ...]
+    blocks = []
+
+    # 페이지 단위로 처리하지만 스레드로 나누지는 않는다.
+    # PyMuPDF 문서 객체는 여러 스레드에서 동시에 쓰는 것을 지원하지 않는다.
+    with doc:
+        for page_no, page in enumerate(doc, 1):
+            for header, rows in _extract_page_tables(page):
+                if blocks and blocks[-1][0] == header:
+                    blocks[-1][1].extend(rows)
+                else:
+                    blocks.append((header, list(rows)))
+            # 긴 PDF 에서 MuPDF 내부 캐시(글꼴/그림 등)가 계속 커지지 않도록 주기적으로 비운다
+            if page_no % _STORE_SHRINK_PAGES == 0:
+                pymupdf.TOOLS.store_shrink(100)
+
+    if not blocks:
         raise ValueError("PDF에서 '순번' 헤더를 가진 출장 표를 찾지 못했습니다.")
 
-    df_all = pd.concat(tables, ignore_index=True)
+    # 셀은 str/None 뿐이라 dtype 추론 없이 object 로 바로 만든다
+    # (보통 모든 페이지 헤더가 같아 DataFrame 하나로 끝나고, 헤더가 바뀔 때만 concat)
+    frames = [pd.DataFrame(rows, columns=header, dtype=object) for header, rows in blocks]
+    df_all = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
 
-    # 열 이름/값 정리
+    # 열 이름 정리 후 필요한 컬럼 찾기
     df_all.columns = [str(c).strip() for c in df_all.columns]
-    df_all = df_all.fillna("").astype(str)
-    df_all = df_all.apply(lambda col: col.str.strip())
 
-    # 필요한 컬럼 찾기
     col_name = _find_col(df_all, ["성명"])
     col_period = _find_col(df_all, ["출장기간"])
     col_dur = _find_col(df_all, ["총출장시간"])
@@ -222,15 +211,17 @@ def parse_pdf_to_rows(
             f"필수 열(성명/출장기간/총출장시간/공무용차량/합계)을 찾지 못했습니다. 실제 열 목록: {list(df_all.columns)}"
         )
 
+    # 값 정리 (빈 칸 → "", 앞뒤 공백 제거)는 실제로 쓰는 열에만 한 번씩
+    for col in dict.fromkeys([col_name, col_period, col_dur, col_car, col_amount]):
+        df_all[col] = df_all[col].fillna("").astype(str).str.strip()
+
     # 유효 행 필터링: 성명/출장기간 비어 있는 행, '합계', '소계' 등 제외
     name_raw = df_all[col_name]
     period_raw = df_all[col_period]
 
     mask_valid = (
-        name_raw.notna()
-        & (name_raw.str.strip() != "")
-        & period_raw.notna()
-        & (period_raw.str.strip() != "")
+        (name_raw != "")
+        & (period_raw != "")
         & (~name_raw.str.contains("합계"))
         & (~name_raw.str.contains("소계"))
     )
@@ -238,18 +229,29 @@ def parse_pdf_to_rows(
     df_use = df_all[mask_valid].copy()
 
     # 최소 컬럼 생성
-    df_use["성명"] = df_use[col_name].apply(_extract_name)
-
-    (
-        df_use["시작일자"],
-        df_use["시작시각"],
-        df_use["종료일자"],
-        df_use["종료시각"],
-    ) = zip(*df_use[col_period].apply(_parse_period))
-
-    df_use["minutes"] = df_use[col_dur].apply(_parse_minutes)
-    df_use["car_used"] = df_use[col_car].eq("사용")
-    df_use["amount_pdf"] = df_use[col_amount].apply(_to_int_safe)
+    df_use["성명"] = df_use[col_name].str.extract(_NAME_RE, expand=False).str.strip()
+
+    period = _parse_period(df_use[col_period])
+    df_use["시작일자"] = period["start_date"]
+    df_use["시작시각"] = period["start_time"]
+    df_use["종료일자"] = period["end_date"]
+    df_use["종료시각"] = period["end_time"]
+
+    # 정수/불리언 dtype을 여기서 확정해 두면 이후 집계에서 별도 변환이 필요 없다
+    df_use["minutes"] = _parse_minutes(df_use[col_dur])
+    df_use["car_used"] = df_use[col_car].eq("사용").astype(bool)
+    # 금액: 공백류/쉼표 제거 후 숫자로 (빈칸, '-', '0원' 등 숫자가 아니면 0)
+    # (전각 숫자/쉼표는 NFKC 로 일반 문자로 바꾸고, inf 등 유한하지 않은 값도 0)
+    amount = (
+        df_use[col_amount]
+        .str.normalize("NFKC")
+        .str.translate(_WS_STRIP_TBL)
+        .str.replace(",", "", regex=False)
+    )
+    amount = pd.to_numeric(amount, errors="coerce")
+    # int64 범위를 벗어나는 값도 inf 와 같이 0 (정수 변환 시 값이 뒤틀리지 않도록)
+    in_range = np.isfinite(amount) & (amount.abs() < 2**63)
+    df_use["amount_pdf"] = amount.where(in_range, 0).astype(np.int64)
 
     cols_final = [
         "성명",
@@ -13,6 +13,7 @@
 """
 
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 
 
@@ -25,20 +26,22 @@ def _normalize_minutes(minutes: int) -> int:
     return max(m, 0)
 
 
+# 공용차량 사용 여부로 인정하는 값 (호출마다 집합을 새로 만들지 않도록 모듈 수준에 둔다)
+_CAR_TRUE_VALUES = frozenset({"사용", "y", "yes", "true", "1", 1, True})
+_CAR_FALSE_VALUES = frozenset({"미사용", "n", "no", "false", "0", 0, False})
+
+
 def _normalize_car_used(car_used) -> bool:
     """공용차량 사용 여부를 문자열/숫자/불리언 입력에 관계없이 bool로 변환."""
-    true_values = {"사용", "y", "yes", "true", "1", 1, True}
-    false_values = {"미사용", "n", "no", "false", "0", 0, False}
-
-    if car_used in true_values:
+    if car_used in _CAR_TRUE_VALUES:
         return True
-    if car_used in false_values:
+    if car_used in _CAR_FALSE_VALUES:
         return False
     if isinstance(car_used, str):
         normalized = car_used.strip().lower()
-        if normalized in true_values:
+        if normalized in _CAR_TRUE_VALUES:
             return True
-        if normalized in false_values:
+        if normalized in _CAR_FALSE_VALUES:
             return False
     return bool(car_used)
 
@@ -60,57 +63,117 @@ def calc_row_amount(minutes: int, car_used: bool) -> int:
     return amt
 
 
-def compute_allowance_by_person(df_rows: pd.DataFrame) -> pd.Series:
+def _group_ids(df: pd.DataFrame, keys: list) -> np.ndarray:
+    """keys 조합별 그룹 번호 (키가 비어 있는(NaN) 행은 -1)."""
+    return df.groupby(keys, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _apply_cap(gids: np.ndarray, base: np.ndarray, cap: int) -> np.ndarray:
+    """
+    그룹 번호(gids, 음수는 그룹 없음)별로 base 를 원래 행 순서대로 누적하되
+    합계가 cap 을 넘지 않도록 각 행에 인정되는 금액을 반환. base 값은 0 이상이라고 가정.
+    """
+    out = np.zeros(len(base), dtype=np.int64)
+    if not len(base):
+        return out
+
+    # 같은 그룹끼리 모으되(안정 정렬) 그룹 안의 원래 순서는 유지
+    order = np.argsort(gids, kind="stable")
+    g = gids[order]
+    b = base[order].astype(np.int64, copy=False)
+
+    # 그룹 시작 위치마다 누적합을 0부터 다시 세기
+    cum_before = np.cumsum(b) - b
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    cum_before -= np.repeat(cum_before[starts], np.diff(np.r_[starts, len(g)]))
+
+    allowed = np.clip(cap - cum_before, 0, b)
+    allowed[g < 0] = 0  # 성명/일자가 비어 있는 행은 인정하지 않음
+    out[order] = allowed
+    return out
+
+
+def compute_row_allowance(df_rows: pd.DataFrame, return_person_codes: bool = False):
     """
     행단위 데이터(df_rows)를 받아,
     규칙(건별 -> 일별 -> 월별 상한)을 적용한 뒤
-    성명별 최종 금액(계산_총지급액)을 반환.
+    각 행(출장 1건)에 최종 인정되는 금액 배열(int64, df_rows 행 순서)을 반환.
+    성명별 합계와 PDF 집계를 한 번에 하고 싶은 호출자용.
+
+    return_person_codes=True 이면 (금액 배열, (성명 코드, 코드별 성명)) 을 반환해
+    summarize_pdf_by_person(person_codes=...) 에서 성명을 다시 인코딩하지 않게 한다.
     """
-    df = df_rows.copy()
+    row_final, person_ids, names = _row_allowance(df_rows)
+    if return_person_codes:
+        return row_final, (person_ids, names)
+    return row_final
+
+
+def _row_allowance(df_rows: pd.DataFrame):
+    """
+    compute_row_allowance 본체.
+    (행별 최종 금액, 성명 코드(정렬 순, 성명 없으면 -1), 코드별 성명) 을 함께 반환해
+    성명별 합계에서 성명을 다시 인코딩하지 않도록 한다.
+    """
+    # df_rows 는 복사하지 않고 읽기만 한다 (중간 결과는 배열로만 보관)
+    df = df_rows
 
     required_cols = ["성명", "시작일자", "minutes", "car_used"]
     for col in required_cols:
         if col not in df.columns:
             raise ValueError(f"df_rows에 '{col}' 컬럼이 없습니다.")
 
-    # 1) 건별 기본 금액
-    df["row_base"] = df.apply(
-        lambda r: calc_row_amount(
-            _normalize_minutes(r["minutes"]), _normalize_car_used(r["car_used"])
-        ),
-        axis=1,
-    )
+    # 1) 건별 기본 금액 (calc_row_amount 와 같은 규칙을 배열 연산으로 한 번에)
+    minutes = df["minutes"]
+    if pd.api.types.is_integer_dtype(minutes.dtype):
+        # parse_pdf_to_rows 결과는 이미 정수열이라 변환 없이 음수만 0으로
+        m = np.maximum(minutes.to_numpy(), 0)
+    else:
+        m = (
+            pd.to_numeric(minutes, errors="coerce")
+            .fillna(0)
+            .clip(lower=0)
+            .to_numpy(dtype=np.int64)
+        )
+    car = df["car_used"]
+    if car.dtype != bool:
+        # 값 종류는 몇 개뿐이므로 고유값만 변환해 두고 dict 조회로 펼친다
+        car = car.map({v: _normalize_car_used(v) for v in car.unique()}).astype(bool)
+    car = car.to_numpy()
+
+    base = np.where(m >= 240, 20000, np.where(m >= 60, 10000, 0))
+    row_base = np.where(car & (base > 0), base - 10000, base)
 
     # 2) 1일 상한 적용 (성명 + 시작일자 기준 최대 2만)
-    df["row_daily_limited"] = 0
-    for (name, day), g in df.groupby(["성명", "시작일자"]):
-        cum = 0
-        for idx in g.index:
-            base = int(df.at[idx, "row_base"])
-            if base <= 0 or cum >= 20000:
-                add = 0
-            elif cum + base <= 20000:
-                add = base
-            else:
-                add = 20000 - cum
-            cum += add
-            df.at[idx, "row_daily_limited"] = add
+    #    그룹 안에서 원래 행 순서대로 누적했을 때 상한까지 남은 만큼만 인정
+    day_ids = _group_ids(df, ["성명", "시작일자"])
+    row_daily_limited = _apply_cap(day_ids, row_base, 20000)
 
     # 3) 1달 상한 적용 (성명 기준 최대 28만)
-    df["row_final"] = 0
-    for name, g in df.groupby("성명"):
-        cum = 0
-        for idx in g.index:
-            base = int(df.at[idx, "row_daily_limited"])
-            if base <= 0 or cum >= 280000:
-                add = 0
-            elif cum + base <= 280000:
-                add = base
-            else:
-                add = 280000 - cum
-            cum += add
-            df.at[idx, "row_final"] = add
-
-    person_totals = df.groupby("성명")["row_final"].sum()
-    person_totals = person_totals.fillna(0).astype(int)
-    return person_totals
+    #    (성명은 정렬된 정수 코드로 한 번만 바꿔 상한 적용과 합계에 같이 쓴다)
+    person_ids, names = pd.factorize(df["성명"], sort=True)
+    return _apply_cap(person_ids, row_daily_limited, 280000), person_ids, names
+
+
+def compute_allowance_by_person(df_rows: pd.DataFrame) -> pd.Series:
+    """
+    행단위 데이터(df_rows)를 받아,
+    규칙(건별 -> 일별 -> 월별 상한)을 적용한 뒤
+    성명별 최종 금액(계산_총지급액)을 반환.
+    """
+    row_final, person_ids, names = _row_allowance(df_rows)
+
+    # 성명별 합계: 정렬된 정수 코드 순으로 모은 뒤 구간별 np.add.reduceat (성명 없는 행(-1)은 제외)
+    order = np.argsort(person_ids, kind="stable")
+    ids = person_ids[order]
+    keep = ids >= 0
+    ids, values = ids[keep], row_final[order][keep]
+    if not len(ids):
+        return pd.Series([], index=pd.Index(names[:0], name="성명"), name="row_final", dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return pd.Series(
+        np.add.reduceat(values, starts),
+        index=pd.Index(names[ids[starts]], name="성명"),
+        name="row_final",
+    )